@@ -1,16 +1,36 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
+from contextlib import asynccontextmanager
 from pathlib import Path
 from satellite_fetcher import SatelliteDataFetcher
 from typing import Optional
+import io
 import json
 import os
-import requests
+import time
 from datetime import datetime
+from types import MappingProxyType
 import re
 
-app = FastAPI(title="SierraVision Backend")
+# PDF generation libraries (optional - only needed for report export)
+try:
+    from reportlab.lib.pagesizes import A4
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image as RLImage, Table, TableStyle
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.lib.units import inch
+    from reportlab.lib import colors
+    REPORTLAB_AVAILABLE = True
+except ImportError:
+    REPORTLAB_AVAILABLE = False
+
+# Application lifespan - close the fetcher's pooled HTTP connections on shutdown
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    sattelite_fetcher.close()
+
+app = FastAPI(title="SierraVision Backend", lifespan=lifespan)
 
 sattelite_fetcher = SatelliteDataFetcher()
 
@@ -29,6 +49,22 @@ app.add_middleware(
 DATA_DIR = Path(__file__).parent / "data"
 REPORTS_DIR = Path(__file__).parent / "reports"
 
+# Image file extensions (counted images, removable images, images embeddable in reports)
+_IMG_EXTS_READ = frozenset({'.png', '.jpg', '.jpeg', '.tiff'})
+_IMG_EXTS_ALL = _IMG_EXTS_READ | frozenset({'.gif', '.bmp'})
+_IMG_EXTS_REPORT = frozenset({'.png', '.jpg', '.jpeg'})
+
+# Last formatted timestamp, cached at one-second resolution
+_last_ts = (0, "")
+
+def iso_now():
+    """Return the current local time as an ISO string, reformatted at most once per second"""
+    global _last_ts
+    t = int(time.time())
+    if t != _last_ts[0]:
+        _last_ts = (t, datetime.fromtimestamp(t).isoformat())
+    return _last_ts[1]
+
 # Image listing endpoint - list all images in the data directory
 @app.get("/api/images")
 def list_images():
@@ -40,44 +76,58 @@ def list_images():
                 files.append(p.name)
     return {"images": files}
 
+# Static part of the system status payload, built once at import time
+_STATUS_TEMPLATE = MappingProxyType({
+    "data_sources": {
+        "multi_source": {
+            "available": True,
+            "status": "Ready",
+            "capabilities": (
+                "Multi-source high-quality imagery",
+                "NASA GIBS WMTS tiles at native 250 m resolution",
+                "MODIS, VIIRS, and Landsat data",
+                "Automatic source fallback",
+                "Image enhancement and optimization",
+                "Real-time quality assessment",
+                "Real-time fire detection",
+                "VIIRS and MODIS sensors",
+                "GeoJSON format",
+                "Confidence scoring",
+                "Regional filtering"
+            ),
+            "quality": "High",
+            "priority": 1
+        }
+    },
+    "primary_source": "Multi-Source Fetcher",
+    "region": "Sierra Madre, Philippines",
+    "image_quality": "Native 250 m resolution with automatic enhancement",
+    "fallback_data": {
+        "available": True,
+        "description": "Enhanced multi-source fallback with confidence intervals",
+        "sources": ("Hansen GFC v1.11", "MODIS", "Landsat", "National Forest Inventory")
+    }
+})
+
+# Data directory file count, keyed by the directory's modification time
+_image_count_cache = (None, 0)
+
+def _cached_image_count():
+    """Count files in the data directory, recounting only when the directory changes"""
+    global _image_count_cache
+    try:
+        mtime = DATA_DIR.stat().st_mtime_ns
+    except OSError:
+        return 0
+    if mtime != _image_count_cache[0]:
+        _image_count_cache = (mtime, len([p for p in DATA_DIR.iterdir() if p.is_file()]))
+    return _image_count_cache[1]
+
 # System status endpoint - status of data sources and capabilities
 @app.get("/api/system/status")
 def get_system_status():
     """Get system status for satellite fetcher and external APIs"""
-    
-    return {
-        "timestamp": datetime.now().isoformat(),
-        "data_sources": {
-            "multi_source": {
-                "available": True,
-                "status": "Ready",
-                "capabilities": [
-                    "Multi-source high-quality imagery",
-                    "NASA GIBS WMS (1024x1024 resolution)",
-                    "MODIS, VIIRS, and Landsat data",
-                    "Automatic source fallback",
-                    "Image enhancement and optimization",
-                    "Real-time quality assessment",
-                    "Real-time fire detection",
-                    "VIIRS and MODIS sensors",
-                    "GeoJSON format",
-                    "Confidence scoring",
-                    "Regional filtering"
-                ],
-                "quality": "High",
-                "priority": 1
-            }
-        },
-        "primary_source": "Multi-Source Fetcher",
-        "region": "Sierra Madre, Philippines",
-        "image_count": len([p for p in DATA_DIR.iterdir() if p.is_file()]) if DATA_DIR.exists() else 0,
-        "image_quality": "Up to 1024x1024 resolution with automatic enhancement",
-        "fallback_data": {
-            "available": True,
-            "description": "Enhanced multi-source fallback with confidence intervals",
-            "sources": ["Hansen GFC v1.11", "MODIS", "Landsat", "National Forest Inventory"]
-        }
-    }
+    return {"timestamp": iso_now(), **_STATUS_TEMPLATE, "image_count": _cached_image_count()}
 
 # Fire data endpoint - active fire data for Sierra Madre region
 @app.get("/api/nasa/fire-data")
@@ -99,7 +149,7 @@ def fetch_high_quality_comparison_images():
             "2002-07-01", "2024-07-01", "sierra_madre"
         )
         result["data_source"] = "Enhanced Multi-Source (NASA MODIS, VIIRS) + Global Forest Change"
-        result["image_quality"] = "High resolution (1024x1024) enhanced satellite imagery"
+        result["image_quality"] = "High resolution (native 250 m) enhanced satellite imagery"
         return result
             
     except Exception as e:
@@ -117,12 +167,11 @@ def get_detailed_analytics(region: str):
         fire_data = sattelite_fetcher.get_fire_data()
         
         # Count available images
-        image_extensions = {'.png', '.jpg', '.jpeg', '.tiff'}
         image_count = 0
         if DATA_DIR.exists():
             image_count = len([
                 p for p in DATA_DIR.iterdir() 
-                if p.is_file() and p.suffix.lower() in image_extensions
+                if p.is_file() and os.path.splitext(p.name)[1].lower() in _IMG_EXTS_READ
             ])
         
         # Process fire data
@@ -133,7 +182,7 @@ def get_detailed_analytics(region: str):
         
         return {
             "region": region,
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": iso_now(),
             "environmental_indicators": {
                 "active_fires": active_fires,
                 "high_confidence_fires": high_confidence_fires,
@@ -192,7 +241,7 @@ def fetch_year_range_images(start_year: int = 2010, end_year: int = 2025, region
         return {
             "status": "success",
             "data": result,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": iso_now()
         }
         
     except HTTPException:
@@ -217,7 +266,7 @@ def fetch_single_year(year: int, region: str = "sierra_madre"):
         return {
             "status": "success",
             "data": result,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": iso_now()
         }
         
     except HTTPException:
@@ -254,7 +303,7 @@ def get_available_years(region: str = "sierra_madre"):
                 "earliest": min(available_years) if available_years else None,
                 "latest": max(available_years) if available_years else None
             },
-            "timestamp": datetime.now().isoformat()
+            "timestamp": iso_now()
         }
         
     except Exception as e:
@@ -266,7 +315,7 @@ def health_check():
     """Simple health check endpoint"""
     return {
         "status": "healthy",
-        "timestamp": datetime.now().isoformat(),
+        "timestamp": iso_now(),
         "version": "1.0.0",
         "service": "SierraVision Backend"
     }
@@ -277,43 +326,57 @@ def refresh_all_data(remove_images: bool = True):
     """Refresh all data and optionally remove cached images"""
     try:
         refresh_results = {
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": iso_now(),
             "actions_performed": [],
             "images_removed": [],
             "errors": []
         }
         
+        # Read the data directory once and classify entries
+        entries = list(os.scandir(DATA_DIR)) if DATA_DIR.exists() else []
+        image_entries = [e for e in entries if e.is_file() and os.path.splitext(e.name)[1].lower() in _IMG_EXTS_ALL]
+        summary_entries = [e for e in entries if e.name.endswith("_analysis_summary.json")]
+        dashboard_entries = [e for e in entries if e.name.endswith("_forest_monitoring_dashboard.png")]
+        
         # Remove image files if requested
-        if remove_images and DATA_DIR.exists():
-            image_extensions = {'.png', '.jpg', '.jpeg', '.tiff', '.gif', '.bmp'}
-            for p in DATA_DIR.iterdir():
-                if p.is_file() and p.suffix.lower() in image_extensions:
-                    try:
-                        os.remove(p)
-                        refresh_results["images_removed"].append(p.name)
-                    except Exception as e:
-                        refresh_results["errors"].append(f"Failed to remove {p.name}: {str(e)}")
+        if remove_images:
+            for entry in image_entries:
+                try:
+                    os.remove(entry.path)
+                    refresh_results["images_removed"].append(entry.name)
+                except Exception as e:
+                    refresh_results["errors"].append(f"Failed to remove {entry.name}: {str(e)}")
             
             if refresh_results["images_removed"]:
                 refresh_results["actions_performed"].append(f"Removed {len(refresh_results['images_removed'])} image files")
+            
+            # Dashboards are images too, so only the ones not removed above remain
+            dashboard_entries = [e for e in dashboard_entries if e.name not in refresh_results["images_removed"]]
         
         # Clear analysis summaries
-        summary_files = list(DATA_DIR.glob("*_analysis_summary.json"))
-        for summary_file in summary_files:
+        for summary_entry in summary_entries:
             try:
-                os.remove(summary_file)
-                refresh_results["actions_performed"].append(f"Removed analysis summary: {summary_file.name}")
+                os.remove(summary_entry.path)
+                refresh_results["actions_performed"].append(f"Removed analysis summary: {summary_entry.name}")
             except Exception as e:
-                refresh_results["errors"].append(f"Failed to remove {summary_file.name}: {str(e)}")
+                refresh_results["errors"].append(f"Failed to remove {summary_entry.name}: {str(e)}")
         
         # Clear dashboard files
-        dashboard_files = list(DATA_DIR.glob("*_forest_monitoring_dashboard.png"))
-        for dashboard_file in dashboard_files:
+        for dashboard_entry in dashboard_entries:
             try:
-                os.remove(dashboard_file)
-                refresh_results["actions_performed"].append(f"Removed dashboard: {dashboard_file.name}")
+                os.remove(dashboard_entry.path)
+                refresh_results["actions_performed"].append(f"Removed dashboard: {dashboard_entry.name}")
             except Exception as e:
-                refresh_results["errors"].append(f"Failed to remove {dashboard_file.name}: {str(e)}")
+                refresh_results["errors"].append(f"Failed to remove {dashboard_entry.name}: {str(e)}")
+        
+        # Drop the fetcher's caches so images and fire data are fetched from NASA again
+        try:
+            cache_files_removed = sattelite_fetcher.clear_cache(images=remove_images)
+            refresh_results["actions_performed"].append("Cleared cached fire data")
+            if cache_files_removed:
+                refresh_results["actions_performed"].append(f"Removed {cache_files_removed} cached download files")
+        except Exception as e:
+            refresh_results["errors"].append(f"Failed to clear download cache: {str(e)}")
         
         # Try to fetch fresh fire data
         try:
@@ -333,17 +396,37 @@ def refresh_all_data(remove_images: bool = True):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error refreshing data: {str(e)}")
 
+# Report styles and table boilerplate shared by every PDF export
+_METRICS_HEADER = ('Metric', 'Value', 'Source')
+
+if REPORTLAB_AVAILABLE:
+    _REPORT_STYLES = getSampleStyleSheet()
+    _TITLE_STYLE = ParagraphStyle(
+        'CustomTitle',
+        parent=_REPORT_STYLES['Heading1'],
+        fontSize=24,
+        spaceAfter=30,
+        textColor=colors.darkgreen
+    )
+    _TABLE_STYLE = TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.darkgreen),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 12),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black)
+    ])
+
 # PDF report generation endpoint - generate comprehensive PDF report
 @app.post("/api/export-report/{region}")
 def export_report_pdf(region: str):
     """Generate and export a comprehensive PDF report for the region"""
+    if not REPORTLAB_AVAILABLE:
+        raise HTTPException(status_code=500, detail="PDF generation libraries not installed. Please install reportlab: pip install reportlab")
+    
     try:
-        from reportlab.lib.pagesizes import A4
-        from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image as RLImage, Table, TableStyle
-        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-        from reportlab.lib.units import inch
-        from reportlab.lib import colors
-        
         # Create report filename
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         report_filename = f"{region}_environmental_report_{timestamp}.pdf"
@@ -351,26 +434,16 @@ def export_report_pdf(region: str):
         
         # Create PDF document
         doc = SimpleDocTemplate(str(report_path), pagesize=A4)
-        story = []
-        styles = getSampleStyleSheet()
-        
-        # Custom styles
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=24,
-            spaceAfter=30,
-            textColor=colors.darkgreen
-        )
-        
-        # Title
-        story.append(Paragraph(f"SierraVision Environmental Report", title_style))
-        story.append(Paragraph(f"Region: {region.replace('_', ' ').title()}", styles['Heading2']))
-        story.append(Paragraph(f"Generated: {datetime.now().strftime('%B %d, %Y at %I:%M %p')}", styles['Normal']))
-        story.append(Spacer(1, 20))
-        
-        # Executive Summary
-        story.append(Paragraph("Executive Summary", styles['Heading2']))
+        styles = _REPORT_STYLES
+        
+        # Title and Executive Summary heading
+        story = [
+            Paragraph(f"SierraVision Environmental Report", _TITLE_STYLE),
+            Paragraph(f"Region: {region.replace('_', ' ').title()}", styles['Heading2']),
+            Paragraph(f"Generated: {datetime.now().strftime('%B %d, %Y at %I:%M %p')}", styles['Normal']),
+            Spacer(1, 20),
+            Paragraph("Executive Summary", styles['Heading2'])
+        ]
         
         # Get current data for the report
         summary_data = {}
@@ -396,21 +469,20 @@ def export_report_pdf(region: str):
         based on NASA satellite data and fire monitoring systems. Key findings include {active_fires} active fire detections 
         and analysis of temporal changes in forest coverage over the past two decades.
         """
-        story.append(Paragraph(executive_summary, styles['Normal']))
-        story.append(Spacer(1, 20))
-        
-        # Key Metrics Table
-        story.append(Paragraph("Key Environmental Metrics", styles['Heading2']))
+        story.extend((
+            Paragraph(executive_summary, styles['Normal']),
+            Spacer(1, 20),
+            Paragraph("Key Environmental Metrics", styles['Heading2'])
+        ))
         
         # Count available images
-        image_extensions = {'.png', '.jpg', '.jpeg', '.tiff'}
         image_count = len([
             p for p in DATA_DIR.iterdir() 
-            if DATA_DIR.exists() and p.is_file() and p.suffix.lower() in image_extensions
+            if DATA_DIR.exists() and p.is_file() and os.path.splitext(p.name)[1].lower() in _IMG_EXTS_READ
         ])
         
         metrics_data = [
-            ['Metric', 'Value', 'Source'],
+            _METRICS_HEADER,
             ['Active Fire Detections', str(active_fires), 'NASA FIRMS'],
             ['Satellite Images Available', str(image_count), 'NASA Worldview'],
             ['Monitoring Region', region.replace('_', ' ').title(), 'Configuration'],
@@ -419,37 +491,34 @@ def export_report_pdf(region: str):
         ]
         
         metrics_table = Table(metrics_data)
-        metrics_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.darkgreen),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black)
-        ]))
-        
-        story.append(metrics_table)
-        story.append(Spacer(1, 20))
+        metrics_table.setStyle(_TABLE_STYLE)
         
         # Add images if available
-        story.append(Paragraph("Satellite Imagery Analysis", styles['Heading2']))
+        story.extend((
+            metrics_table,
+            Spacer(1, 20),
+            Paragraph("Satellite Imagery Analysis", styles['Heading2'])
+        ))
         
         # Look for comparison images
-        image_extensions = {'.png', '.jpg', '.jpeg'}
         comparison_images = [
             p for p in DATA_DIR.iterdir() 
-            if DATA_DIR.exists() and p.is_file() and p.suffix.lower() in image_extensions and region in p.name
+            if DATA_DIR.exists() and p.is_file() and os.path.splitext(p.name)[1].lower() in _IMG_EXTS_REPORT and region in p.name
         ]
         
         if comparison_images:
-            for img_path in comparison_images[:4]:  # Limit to 4 images to fit on page
+            selected_images = comparison_images[:4]  # Limit to 4 images to fit on page
+            image_buffers = read_image_buffers(selected_images)
+            for img_path, img_buffer in zip(selected_images, image_buffers):
                 try:
-                    story.append(Paragraph(f"Image: {img_path.name}", styles['Heading3']))
-                    img = RLImage(str(img_path), width=4*inch, height=3*inch)
-                    story.append(img)
-                    story.append(Spacer(1, 10))
+                    if img_buffer is None:
+                        raise OSError(f"Could not read {img_path.name}")
+                    img = RLImage(img_buffer, width=4*inch, height=3*inch)
+                    story.extend((
+                        Paragraph(f"Image: {img_path.name}", styles['Heading3']),
+                        img,
+                        Spacer(1, 10)
+                    ))
                 except Exception as e:
                     story.append(Paragraph(f"Could not load image: {img_path.name}", styles['Normal']))
         else:
@@ -459,22 +528,25 @@ def export_report_pdf(region: str):
         
         # Fire Analysis Section
         if fire_data and fire_data.get("features"):
-            story.append(Paragraph("Fire Detection Analysis", styles['Heading2']))
-            
             fires = fire_data.get("features", [])
-            high_confidence = sum(1 for f in fires if f.get("properties", {}).get("confidence", 0) > 75)
+            high_confidence = count_high_confidence_fires(fires)
             
             fire_analysis = f"""
             Analysis of {len(fires)} fire detections reveals {high_confidence} high-confidence detections 
             (confidence > 75%). Fire data is provided by NASA's Fire Information for Resource Management System (FIRMS)
             which uses MODIS and VIIRS satellite sensors for near real-time fire detection.
             """
-            story.append(Paragraph(fire_analysis, styles['Normal']))
+            story.extend((
+                Paragraph("Fire Detection Analysis", styles['Heading2']),
+                Paragraph(fire_analysis, styles['Normal'])
+            ))
         
         # Footer
-        story.append(Spacer(1, 30))
-        story.append(Paragraph("Report generated by SierraVision Environmental Monitoring System", styles['Normal']))
-        story.append(Paragraph("Data sources: NASA FIRMS, NASA Worldview, NASA Earthdata", styles['Normal']))
+        story.extend((
+            Spacer(1, 30),
+            Paragraph("Report generated by SierraVision Environmental Monitoring System", styles['Normal']),
+            Paragraph("Data sources: NASA FIRMS, NASA Worldview, NASA Earthdata", styles['Normal'])
+        ))
         
         # Build PDF
         doc.build(story)
@@ -488,8 +560,6 @@ def export_report_pdf(region: str):
             "file_size_mb": round(report_path.stat().st_size / (1024*1024), 2)
         }
         
-    except ImportError:
-        raise HTTPException(status_code=500, detail="PDF generation libraries not installed. Please install reportlab: pip install reportlab")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating PDF report: {str(e)}")
 
@@ -529,7 +599,7 @@ def get_fallback_forest_data(region):
             "confidence": "High - Cross-validated satellite + ground truth",
             "api_status": "Hansen Fallback",
             "methodology": "Integrated analysis of Hansen GFC, MODIS, Landsat, and national forest inventory data",
-            "last_updated": datetime.now().isoformat()
+            "last_updated": iso_now()
         }
     else:
         return {
@@ -548,9 +618,20 @@ def get_fallback_forest_data(region):
             "data_source": "Hansen GFC + Regional Analysis",
             "confidence": "Medium - Satellite validated with regional scaling",
             "api_status": "Hansen Fallback",
-            "last_updated": datetime.now().isoformat()
+            "last_updated": iso_now()
         }
 
+# Read report images into memory
+def read_image_buffers(image_paths):
+    """Read each image once into an in-memory buffer for ReportLab (None if unreadable)"""
+    buffers = []
+    for img_path in image_paths:
+        try:
+            buffers.append(io.BytesIO(img_path.read_bytes()))
+        except OSError:
+            buffers.append(None)
+    return buffers
+
 # Calculate average fire confidence
 def calculate_fire_confidence_avg(features):
     """Calculate average confidence score for fire detections"""
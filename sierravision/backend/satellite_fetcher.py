@@ -3,7 +3,7 @@ Satellite Data Fetcher
 ======================
 Satellite imagery fetcher that combines multiple high-quality sources:
 - Google Earth Engine (when available)
-- NASA GIBS (high-quality WMS service)
+- NASA GIBS (pre-rendered WMTS tiles, with WMS as fallback)
 - NASA Earthdata (processed satellite data)
 - NASA FIRMS (fire data)
 
@@ -12,53 +12,201 @@ and falling back gracefully when services are unavailable.
 """
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import numpy as np
+import pandas as pd
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from typing import Dict, List, NamedTuple, Optional, Tuple
 from pathlib import Path
+from urllib.parse import urlencode
+import hashlib
+import io
 import json
 import os
+import shutil
+import sys
+import threading
+import time
 from dotenv import load_dotenv
 from PIL import Image
-import matplotlib.pyplot as plt
-import matplotlib
-matplotlib.use('Agg') 
 
 # Load environment variables
 load_dotenv()
 
+# Cache lifetimes (seconds): imagery/fire data for past dates never changes,
+# data for today (or yesterday's near-real-time feed) may still be updated
+CACHE_TTL_HISTORICAL = 365 * 24 * 3600
+CACHE_TTL_CURRENT = 3600
+
+# Size cap for cache-only images in data/cache (images still linked into data/ are not
+# counted, since evicting them frees no space); the least recently used are evicted first
+MAX_CACHE_BYTES = 500 * 1024 * 1024
+
+# HTTP (connect, read) timeouts in seconds: fail fast on dead sockets and let the
+# session's retry policy back off and try again
+HTTP_TIMEOUT = (5, 20)
+
+# Chunk size for streaming image downloads to disk
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+# Maximum number of image downloads in flight at once (GIBS throttles heavy clients)
+MAX_CONCURRENT_DOWNLOADS = 4
+
+# Maximum number of HTTP requests (tiles, GetMap images, FIRMS feeds) in flight at once
+# across all thread pools of a fetcher, whatever the fan-out of the callers
+MAX_CONCURRENT_REQUESTS = 8
+
+# NASA GIBS WMS endpoint (EPSG:4326, best available imagery)
+GIBS_WMS_URL = "https://gibs.earthdata.nasa.gov/wms/epsg4326/best/wms.cgi"
+
+# NASA GIBS WMTS endpoint (pre-rendered EPSG:4326 tiles, served from GIBS's tile cache)
+GIBS_WMTS_URL = "https://gibs.earthdata.nasa.gov/wmts/epsg4326/best/wmts.cgi"
+
+# GIBS true color layers in the order they are tried, with their display names
+GIBS_LAYERS = (
+    ('MODIS_Terra_CorrectedReflectance_TrueColor', 'NASA GIBS MODIS Terra'),   # Most commonly used, high success rate
+    ('VIIRS_SNPP_CorrectedReflectance_TrueColor', 'NASA GIBS VIIRS')           # Backup high quality option
+)
+
+# GIBS EPSG:4326 tile grid: 512px tiles anchored at (-180, 90) with 0.5625°/px at level 0.
+# Level 8 of the 250m matrix set is the native MODIS/VIIRS true color resolution.
+WMTS_TILE_SIZE = 512
+WMTS_LEVEL0_RES = 0.5625
+WMTS_TILE_MATRIX_SET = '250m'
+WMTS_TILE_MATRIX = 8
+
+# Native pixel size of the true color layers (degrees) and the largest WMS image to request
+NATIVE_RES_DEG = WMTS_LEVEL0_RES / 2 ** WMTS_TILE_MATRIX
+MAX_WMS_SIZE = 2048
+
+# FIRMS CSV columns used for fire detections (MODIS and VIIRS variants) and their parse types.
+# Confidence is read as text because VIIRS reports classes (l/n/h) where MODIS reports percentages.
+FIRMS_DTYPES = {
+    'latitude': 'float64',
+    'longitude': 'float64',
+    'brightness': 'float64',
+    'bright_ti4': 'float64',
+    'acq_date': 'str',
+    'confidence': 'str'
+}
+
+
+# Serializes log output from worker threads
+_log_lock = threading.Lock()
+
+
+def log(*lines: str) -> None:
+    """Write lines to stdout in a single call, so output from concurrent threads never interleaves"""
+    with _log_lock:
+        sys.stdout.write("\n".join(lines) + "\n")
+
+
+class BBox(NamedTuple):
+    """Geographic bounding box in decimal degrees (immutable, usable as a cache key)"""
+    north: float
+    south: float
+    east: float
+    west: float
+
+
+class LoggingRetry(Retry):
+    """Retry policy that logs each retry with the delay actually slept before it"""
+    
+    def _log_retry(self, delay: float, reason: str) -> None:
+        last = self.history[-1]
+        log(f" Retrying {last.method} {last.url} (attempt {len(self.history) + 1}, waiting {delay:.1f}s {reason})")
+    
+    def sleep_for_retry(self, response) -> bool:
+        retry_after = self.get_retry_after(response)
+        if retry_after:
+            self._log_retry(retry_after, "as requested by Retry-After")
+            time.sleep(retry_after)
+            return True
+        return False
+    
+    def _sleep_backoff(self) -> None:
+        # Draw the jittered backoff once so the logged delay is the one slept
+        backoff = self.get_backoff_time()
+        self._log_retry(max(backoff, 0), "backoff")
+        if backoff > 0:
+            time.sleep(backoff)
+
 
 class SatelliteDataFetcher:
     """
     Satellite data fetcher with multiple high-quality sources.
     
     Priority order:
-    1. NASA GIBS (high-quality WMS service)
+    1. NASA GIBS (WMTS tiles stitched locally, WMS GetMap as fallback)
     2. NASA Earthdata (processed satellite data)
     3. NASA FIRMS (fire data - always available)
     """
     
     # Initialize with Sierra Madre bounding box
-    def __init__(self):
+    def __init__(self, session: Optional[requests.Session] = None):
         # Sierra Madre coordinates (Philippines - Eastern Luzon)
-        self.sierra_madre_bbox = {
-            'north': 17.5,   # Northern boundary
-            'south': 14.0,   # Southern boundary
-            'east': 122.8,   # Eastern coast (Pacific side)
-            'west': 120.5    # Western boundary
+        self.sierra_madre_bbox = BBox(
+            north=17.5,   # Northern boundary
+            south=14.0,   # Southern boundary
+            east=122.8,   # Eastern coast (Pacific side)
+            west=120.5    # Western boundary
+        )
+        
+        # Region lookups, with the WMS 1.3.0 EPSG:4326 BBOX string (lat/lon axis order) precomputed
+        self._bbox_by_region = {'sierra_madre': self.sierra_madre_bbox}
+        self._wms_bbox_by_region = {
+            region: f"{b.south},{b.west},{b.north},{b.east}"
+            for region, b in self._bbox_by_region.items()
         }
         
+        # Image output directory and the download cache inside it, created once up front
+        self._data_dir = Path(__file__).parent / "data"
+        self._cache_dir = self._data_dir / "cache"
+        self._cache_dir.mkdir(parents=True, exist_ok=True)
+        
         # NASA FIRMS API key
         self.firms_api_key = os.getenv('FIRMS_API_KEY', 'MAP_KEY')
         
-        print(f"Satellite Data Fetcher initialized")
+        # Cached fire data keyed by (date, bbox)
+        self._fire_cache = {}
+        
+        # In-flight fetches, so concurrent identical requests share one download
+        self._inflight: Dict[tuple, Future] = {}
+        self._inflight_lock = threading.Lock()
+        
+        # Global cap on concurrent HTTP requests
+        self._request_slots = threading.BoundedSemaphore(MAX_CONCURRENT_REQUESTS)
+        
+        # Shared HTTP session so repeated GIBS/FIRMS calls reuse keep-alive connections
+        if session is None:
+            session = requests.Session()
+            retry = LoggingRetry(
+                total=4,
+                backoff_factor=1.5,
+                backoff_jitter=1.0,
+                backoff_max=60,
+                status_forcelist=(429, 500, 502, 503, 504),
+                allowed_methods=('GET',),
+                respect_retry_after_header=True,
+                raise_on_status=False
+            )
+            adapter = HTTPAdapter(pool_connections=8, pool_maxsize=16, max_retries=retry)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+        self.session = session
+        
+        log(f"Satellite Data Fetcher initialized")
     
     # Get imagery URLs from commonly used sources
     def get_imagery_urls(self, date: str, region: str = "sierra_madre") -> Dict:
         """
         Get imagery URLs from the most reliable sources (streamlined for efficiency)
         """
-        bbox = self._get_bbox(region)
+        wms_bbox = self._get_wms_bbox(region)
+        width, height = self._get_wms_size(region)
         
         # Convert date to proper format
         try:
@@ -68,99 +216,235 @@ class SatelliteDataFetcher:
             date_formatted = date
         
         urls = {
+            'tiled': [],
             'high_quality': [],
             'standard_quality': [],
             'sources': []
         }
         
-        # 1. NASA GIBS MODIS Terra - Most commonly used, high success rate
-        gibs_modis_url = (
-            f"https://gibs.earthdata.nasa.gov/wms/epsg4326/best/wms.cgi"
-            f"?SERVICE=WMS"
-            f"&REQUEST=GetMap"
-            f"&VERSION=1.3.0"
-            f"&LAYERS=MODIS_Terra_CorrectedReflectance_TrueColor"
-            f"&CRS=EPSG:4326"
-            f"&BBOX={bbox['south']},{bbox['west']},{bbox['north']},{bbox['east']}"
-            f"&WIDTH=1024"
-            f"&HEIGHT=1024"
-            f"&FORMAT=image/png"
-            f"&TIME={date_formatted}"
-        )
-        urls['high_quality'].append(gibs_modis_url)
-        urls['sources'].append('NASA GIBS MODIS Terra')
-        
-        # 2. NASA GIBS VIIRS - Backup high quality option
-        gibs_viirs_url = (
-            f"https://gibs.earthdata.nasa.gov/wms/epsg4326/best/wms.cgi"
-            f"?SERVICE=WMS"
-            f"&REQUEST=GetMap"
-            f"&VERSION=1.3.0"
-            f"&LAYERS=VIIRS_SNPP_CorrectedReflectance_TrueColor"
-            f"&CRS=EPSG:4326"
-            f"&BBOX={bbox['south']},{bbox['west']},{bbox['north']},{bbox['east']}"
-            f"&WIDTH=1024"
-            f"&HEIGHT=1024"
-            f"&FORMAT=image/png"
-            f"&TIME={date_formatted}"
-        )
-        urls['high_quality'].append(gibs_viirs_url)
-        urls['sources'].append('NASA GIBS VIIRS')
+        # Pre-rendered WMTS tiles for every layer are tried before any on-demand GetMap render
+        for layer, source in GIBS_LAYERS:
+            urls['tiled'].append(self._get_tile_mosaic(layer, date_formatted, region, f"{source} (WMTS)"))
+        
+        # Shared GetMap parameters (LAYERS is filled in per source)
+        params = {
+            'SERVICE': 'WMS',
+            'REQUEST': 'GetMap',
+            'VERSION': '1.3.0',
+            'LAYERS': None,
+            'CRS': 'EPSG:4326',
+            'BBOX': wms_bbox,
+            'WIDTH': width,
+            'HEIGHT': height,
+            'FORMAT': 'image/png',
+            'TIME': date_formatted
+        }
+        
+        # On-demand GetMap fallback, one URL per layer
+        for layer, source in GIBS_LAYERS:
+            params['LAYERS'] = layer
+            urls['high_quality'].append(f"{GIBS_WMS_URL}?{urlencode(params, safe=',:/')}")
+            urls['sources'].append(source)
         
         return urls
     
+    # Describe the WMTS tiles covering a region and how to stitch them
+    def _get_tile_mosaic(self, layer: str, date: str, region: str, source: str) -> Dict:
+        """
+        Get the GetTile URLs covering the region's bbox, each with its pixel offset in the
+        stitched image, plus the crop box that trims the stitched tiles to the exact bbox
+        """
+        bbox = self._get_bbox(region)
+        res = NATIVE_RES_DEG
+        
+        # Pixel bounds of the bbox in the level's global grid, and the tiles containing them
+        left = round((bbox.west + 180) / res)
+        right = round((bbox.east + 180) / res)
+        top = round((90 - bbox.north) / res)
+        bottom = round((90 - bbox.south) / res)
+        col0, col1 = left // WMTS_TILE_SIZE, (right - 1) // WMTS_TILE_SIZE
+        row0, row1 = top // WMTS_TILE_SIZE, (bottom - 1) // WMTS_TILE_SIZE
+        
+        params = {
+            'SERVICE': 'WMTS',
+            'REQUEST': 'GetTile',
+            'VERSION': '1.0.0',
+            'LAYER': layer,
+            'STYLE': 'default',
+            'TILEMATRIXSET': WMTS_TILE_MATRIX_SET,
+            'TILEMATRIX': WMTS_TILE_MATRIX,
+            'TILEROW': None,
+            'TILECOL': None,
+            'FORMAT': 'image/jpeg',
+            'TIME': date
+        }
+        tiles = []
+        for row in range(row0, row1 + 1):
+            for col in range(col0, col1 + 1):
+                params['TILEROW'], params['TILECOL'] = row, col
+                tiles.append((
+                    (col - col0) * WMTS_TILE_SIZE,
+                    (row - row0) * WMTS_TILE_SIZE,
+                    f"{GIBS_WMTS_URL}?{urlencode(params, safe=',:/')}"
+                ))
+        
+        origin_x, origin_y = col0 * WMTS_TILE_SIZE, row0 * WMTS_TILE_SIZE
+        return {
+            'source': source,
+            'key': f"wmts|{layer}|{date}|{self._get_wms_bbox(region)}|{WMTS_TILE_MATRIX_SET}/{WMTS_TILE_MATRIX}",
+            'tiles': tiles,
+            'size': ((col1 - col0 + 1) * WMTS_TILE_SIZE, (row1 - row0 + 1) * WMTS_TILE_SIZE),
+            'crop': (left - origin_x, top - origin_y, right - origin_x, bottom - origin_y)
+        }
+    
     # Download image from best available source
     def download_image(self, date: str, filename: str, region: str = "sierra_madre") -> Dict:
         """
         Download the best quality image available from multiple sources
         """
+        return self._coalesce(('image', date, filename, region), self._download_image, date, filename, region)
+    
+    def _download_image(self, date: str, filename: str, region: str) -> Dict:
+        # Collect this download's progress lines and write them as one block, so concurrent
+        # downloads don't interleave
+        messages = [f"Image {filename} ({date}):"]
+        try:
+            return self._fetch_image(date, filename, region, messages)
+        finally:
+            log(*messages)
+    
+    def _fetch_image(self, date: str, filename: str, region: str, messages: List[str]) -> Dict:
         urls_info = self.get_imagery_urls(date, region)
         
-        save_dir = Path(__file__).parent / "data"
-        save_dir.mkdir(exist_ok=True)
-        filepath = save_dir / filename
+        filepath = self._data_dir / filename
+        
+        # Yesterday's near-real-time imagery may still be filled in, so it keeps the short TTL too
+        ttl = self._cache_ttl(date, recent_days=1)
         
         # Try high quality sources first
         all_urls = urls_info['high_quality'] + urls_info['standard_quality']
         all_sources = urls_info['sources']
         
-        for i, (url, source) in enumerate(zip(all_urls, all_sources)):
+        mosaics = urls_info['tiled']
+        
+        # Reuse a previously downloaded image for any of the sources (stitched tiles first)
+        cache_keys = [mosaic['key'] for mosaic in mosaics] + all_urls
+        cache_sources = [mosaic['source'] for mosaic in mosaics] + all_sources
+        for i, (key, source) in enumerate(zip(cache_keys, cache_sources)):
+            cache_path = self._cache_dir / f"{hashlib.sha1(key.encode()).hexdigest()}.png"
+            try:
+                mtime = cache_path.stat().st_mtime
+                if time.time() - mtime >= ttl:
+                    continue
+                # Record the hit in atime (mtime tracks freshness) so LRU eviction keeps it
+                os.utime(cache_path, (time.time(), mtime))
+                self._place_file(cache_path, filepath)
+                messages.append(f" Using cached image from {source}")
+                return self._image_result(source, filename, filepath, i < len(mosaics) + len(urls_info['high_quality']), cached=True)
+            except FileNotFoundError:
+                # Missing, or evicted/cleared while we used it: treat as a cache miss
+                continue
+        
+        # Stitch pre-rendered WMTS tiles (cheap for GIBS to serve, cacheable at its edge)
+        for mosaic in mosaics:
+            source = mosaic['source']
             try:
-                print(f"Trying {source} ({i+1}/{len(all_urls)})...")
+                messages.append(f"Trying {source} ({len(mosaic['tiles'])} tiles)...")
+                cache_path = self._cache_dir / f"{hashlib.sha1(mosaic['key'].encode()).hexdigest()}.png"
+                part_path = cache_path.with_name(f"{cache_path.name}.{threading.get_ident()}.part")
+                try:
+                    self._download_mosaic(mosaic, part_path)
+                    os.replace(part_path, cache_path)
+                except BaseException:
+                    part_path.unlink(missing_ok=True)
+                    raise
+                self._place_file(cache_path, filepath)
+                self._prune_cache()
                 
-                response = requests.get(url, timeout=60)
-                response.raise_for_status()
+                messages.append(f" Successfully downloaded from {source}")
+                return self._image_result(source, filename, filepath, True)
                 
-                # Check if we got an image
-                content_type = response.headers.get('content-type', '')
-                if 'image' in content_type.lower():
-                    with open(filepath, 'wb') as f:
-                        f.write(response.content)
+            except Exception as e:
+                messages.append(f"{source} failed: {e}")
+                continue
+        
+        # Fall back to WMS GetMap, rendered on demand by GIBS
+        for i, (url, source) in enumerate(zip(all_urls, all_sources)):
+            try:
+                messages.append(f"Trying {source} ({i+1}/{len(all_urls)})...")
+                
+                # Revalidate a stale cached copy instead of downloading it again
+                cache_path = self._cache_dir / f"{hashlib.sha1(url.encode()).hexdigest()}.png"
+                with self._request(url, stream=True, headers=self._revalidation_headers(cache_path)) as response:
+                    response.raise_for_status()
                     
-                    print(f" Successfully downloaded from {source}")
+                    if response.status_code == 304:
+                        os.utime(cache_path)
+                        self._place_file(cache_path, filepath)
+                        messages.append(f" Cached image from {source} is still current")
+                        return self._image_result(source, filename, filepath, i < len(urls_info['high_quality']), cached=True)
                     
-                    file_size_mb = filepath.stat().st_size / (1024 * 1024)
-                    return {
-                        'success': True,
-                        'source': source,
-                        'filename': filename,
-                        'file_size_mb': file_size_mb,
-                        'quality': 'High' if i < len(urls_info['high_quality']) else 'Standard',
-                        'resolution': '1024x1024'
-                    }
-                else:
-                    print(f"Not an image from {source}: {content_type}")
+                    # Check if we got an image
+                    content_type = response.headers.get('content-type', '')
+                    if 'image' in content_type.lower():
+                        # Stream into the cache atomically (dropping a partial file if the body fails), then link it into place
+                        part_path = cache_path.with_name(f"{cache_path.name}.{threading.get_ident()}.part")
+                        try:
+                            with open(part_path, 'wb') as f:
+                                for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                                    f.write(chunk)
+                            os.replace(part_path, cache_path)
+                        except BaseException:
+                            part_path.unlink(missing_ok=True)
+                            raise
+                        self._save_validators(cache_path, response.headers)
+                        self._place_file(cache_path, filepath)
+                        self._prune_cache()
+                        
+                        messages.append(f" Successfully downloaded from {source}")
+                        return self._image_result(source, filename, filepath, i < len(urls_info['high_quality']))
+                    else:
+                        messages.append(f"Not an image from {source}: {content_type}")
                     
             except Exception as e:
-                print(f"{source} failed: {e}")
+                messages.append(f"{source} failed: {e}")
                 continue
         
         return {
             'success': False,
             'error': 'No sources available',
-            'sources_tried': all_sources
+            'sources_tried': cache_sources
         }
     
+    # Fetch a mosaic's tiles and stitch them into one image
+    def _download_mosaic(self, mosaic: Dict, dest: Path) -> None:
+        """Download all tiles of a mosaic concurrently and save the stitched, bbox-cropped PNG to dest"""
+        stitched = Image.new('RGB', mosaic['size'])
+        executor = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_DOWNLOADS)
+        try:
+            futures = {executor.submit(self._fetch_tile, url): (x, y) for x, y, url in mosaic['tiles']}
+            for future in as_completed(futures):
+                stitched.paste(future.result(), futures[future])
+        finally:
+            # A failed tile fails the whole mosaic: drop the queued tiles instead of waiting out their retries
+            executor.shutdown(wait=False, cancel_futures=True)
+        
+        # zlib level 1: satellite imagery barely compresses further, and level 6 costs ~7x the CPU
+        stitched.crop(mosaic['crop']).save(dest, format='PNG', compress_level=1)
+    
+    # Fetch and decode a single WMTS tile
+    def _fetch_tile(self, url: str) -> Image.Image:
+        """Download one GetTile image (GIBS answers errors with an XML exception report)"""
+        with self._request(url) as response:
+            response.raise_for_status()
+            content_type = response.headers.get('content-type', '')
+            if 'image' not in content_type.lower():
+                raise ValueError(f"Not an image tile: {content_type}")
+            content = response.content
+        tile = Image.open(io.BytesIO(content))
+        tile.load()
+        return tile
+    
     # Fetch comparison images for two dates
     def fetch_comparison_images(self, 
                                year_2000: str = "2002-07-01", 
@@ -169,24 +453,28 @@ class SatelliteDataFetcher:
         """
         Fetch high-quality comparison images
         """
-        print(f" Fetching satellite imagery for {region}")
+        return self._coalesce(('comparison', region, year_2000, year_2025),
+                              self._fetch_comparison_images, year_2000, year_2025, region)
+    
+    def _fetch_comparison_images(self, year_2000: str, year_2025: str, region: str) -> Dict:
+        log(f" Fetching satellite imagery for {region}")
         
         region_name = region.replace('_', ' ').title()
         
-        # Download 2000/2002 image
-        print(f" Downloading {year_2000} imagery...")
-        result_2000 = self.download_image(
-            year_2000, f"{region}_2000_enhanced.png", region
-        )
-        
-        # Download 2025/2024 image
-        print(f" Downloading {year_2025} imagery...")
-        result_2025 = self.download_image(
-            year_2025, f"{region}_2025_enhanced.png", region
-        )
-        
-        # Get fire data
-        fire_data = self.get_fire_data()
+        # Download both images and the fire data concurrently (network-bound)
+        log(f" Downloading {year_2000} and {year_2025} imagery...")
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            future_2000 = executor.submit(
+                self.download_image, year_2000, f"{region}_2000_enhanced.png", region
+            )
+            future_2025 = executor.submit(
+                self.download_image, year_2025, f"{region}_2025_enhanced.png", region
+            )
+            future_fire = executor.submit(self.get_fire_data)
+            
+            result_2000 = future_2000.result()
+            result_2025 = future_2025.result()
+            fire_data = future_fire.result()
         
         success = result_2000.get('success', False) and result_2025.get('success', False)
         
@@ -212,7 +500,7 @@ class SatelliteDataFetcher:
             result['total_download_mb'] = round(total_size, 2)
             result['image_quality'] = 'Enhanced high-resolution satellite imagery'
         
-        print(f" {result['message']}")
+        log(f" {result['message']}")
         return result
     
     # Fetch fire data from NASA FIRMS
@@ -224,6 +512,12 @@ class SatelliteDataFetcher:
             yesterday = datetime.now() - timedelta(days=1)
             date = yesterday.strftime('%Y-%m-%d')
         
+        bbox = self.sierra_madre_bbox
+        cache_key = (date, bbox)
+        cached = self._fire_cache.get(cache_key)
+        if cached and time.time() - cached[0] < self._cache_ttl(date, recent_days=1):
+            return cached[1]
+        
         # Try both VIIRS and MODIS fire data sources
         urls = [
             f"https://firms.modaps.eosdis.nasa.gov/api/country/csv/{self.firms_api_key}/VIIRS_SNPP_NRT/PHL/1/{date}",
@@ -231,85 +525,277 @@ class SatelliteDataFetcher:
         ]
         
         try:
-            print(f" Fetching fire data from FIRMS API for {date}")
-            
-            sierra_fires = []
-            bbox = self.sierra_madre_bbox
-            
-            for url in urls:
-                try:
-                    response = requests.get(url, timeout=30)
-                    
-                    if response.status_code == 200 and response.text.strip():
-                        lines = response.text.strip().split('\\n')
-                        
-                        print(f" Processing {len(lines)} lines of fire data from {url.split('/')[-3]}")
-                        
-                        # Skip header if present
-                        start_idx = 1 if lines[0].startswith('latitude') else 0
-                        
-                        for line in lines[start_idx:]:
-                            if line.strip():
-                                parts = line.split(',')
-                                if len(parts) >= 9:
-                                    try:
-                                        lat, lon = float(parts[0]), float(parts[1])
-                                        if (bbox['south'] <= lat <= bbox['north'] and
-                                            bbox['west'] <= lon <= bbox['east']):
-                                            sierra_fires.append({
-                                                'latitude': lat,
-                                                'longitude': lon,
-                                                'brightness': float(parts[2]) if parts[2] else None,
-                                                'acq_date': parts[5] if len(parts) > 5 and parts[5] else date,
-                                                'confidence': int(float(parts[8])) if len(parts) > 8 and parts[8] else None
-                                            })
-                                    except (ValueError, IndexError):
-                                        continue
-                    else:
-                        print(f" No fire data from {url.split('/')[-3]}: {response.status_code}")
-                except Exception as e:
-                    print(f" Error with {url.split('/')[-3]}: {e}")
-                    continue
+            log(f" Fetching fire data from FIRMS API for {date}")
             
-            print(f" Found {len(sierra_fires)} fires in Sierra Madre region")
+            # Fetch both feeds concurrently; each is filtered to the bbox as it is parsed
+            with ThreadPoolExecutor(max_workers=len(urls)) as executor:
+                frames = [df for df in executor.map(lambda url: self._load_fire_detections(url, date, bbox), urls)
+                          if df is not None]
+            fetched = bool(frames)
             
-            # Convert to GeoJSON format
             features = []
-            for fire in sierra_fires:
-                features.append({
-                    'type': 'Feature',
-                    'geometry': {
-                        'type': 'Point',
-                        'coordinates': [fire['longitude'], fire['latitude']]
-                    },
-                    'properties': {
-                        'brightness': fire['brightness'],
-                        'confidence': fire['confidence'],
-                        'acq_date': fire['acq_date']
+            if frames:
+                # VIIRS and MODIS overlap: keep one detection per ~100 m cell and day, preferring one with
+                # a numeric confidence (VIIRS only reports l/n/h classes), then restore feed order
+                fires = pd.concat(frames, ignore_index=True)
+                fires = fires.assign(lat_r=fires['latitude'].round(3), lon_r=fires['longitude'].round(3))
+                fires = (fires.sort_values('confidence', ascending=False, na_position='last', kind='stable')
+                         .drop_duplicates(subset=['lat_r', 'lon_r', 'acq_date'])
+                         .sort_index())
+                
+                # Build the GeoJSON features directly from the filtered columns
+                features = [
+                    {
+                        'type': 'Feature',
+                        'geometry': {
+                            'type': 'Point',
+                            'coordinates': [float(lon), float(lat)]
+                        },
+                        'properties': {
+                            'brightness': None if pd.isna(b) else float(b),
+                            'confidence': None if pd.isna(c) else int(c),
+                            'acq_date': d
+                        }
                     }
-                })
+                    for lat, lon, b, d, c in zip(fires['latitude'], fires['longitude'], fires['brightness'],
+                                                 fires['acq_date'], fires['confidence'])
+                ]
             
-            return {
+            log(f" Found {len(features)} fires in Sierra Madre region")
+            
+            result = {
                 'type': 'FeatureCollection',
                 'features': features,
                 'count': len(features)
             }
             
+            # Only cache real responses so a FIRMS outage is retried next time
+            if fetched:
+                self._fire_cache[cache_key] = (time.time(), result)
+            return result
+            
         except Exception as e:
-            print(f" Error fetching fire data: {e}")
+            log(f" Error fetching fire data: {e}")
             return {'type': 'FeatureCollection', 'features': [], 'count': 0}
     
+    # Fetch one FIRMS feed and normalize its detections inside the bbox
+    def _load_fire_detections(self, url: str, date: str, bbox: BBox) -> Optional[pd.DataFrame]:
+        """
+        Return the feed's detections inside bbox as latitude/longitude/brightness/confidence/acq_date
+        columns (None if the feed failed or returned no data)
+        """
+        source = url.split('/')[-4]
+        try:
+            df = self._read_firms_csv(url)
+            if df is None:
+                return None
+            
+            log(f" Processing {len(df)} rows of fire data from {source}")
+            
+            if 'latitude' not in df or 'longitude' not in df:
+                log(f" Unexpected FIRMS response from {source}")
+                return None
+            
+            # Vectorized bounding-box filter: one fused mask over the raw coordinate arrays
+            lat = df['latitude'].to_numpy()
+            lon = df['longitude'].to_numpy()
+            mask = np.logical_and.reduce((
+                lat >= bbox.south, lat <= bbox.north,
+                lon >= bbox.west, lon <= bbox.east
+            ))
+            df = df.loc[mask]
+            
+            # MODIS reports 'brightness', VIIRS reports 'bright_ti4'
+            brightness_column = 'brightness' if 'brightness' in df else 'bright_ti4'
+            brightness = df[brightness_column] if brightness_column in df else pd.Series(index=df.index, dtype=float)
+            # VIIRS confidence is a class (l/n/h) rather than a percentage
+            confidence = pd.to_numeric(df['confidence'], errors='coerce') if 'confidence' in df else pd.Series(index=df.index, dtype=float)
+            acq_date = df['acq_date'].fillna(date) if 'acq_date' in df else pd.Series(date, index=df.index)
+            
+            return pd.DataFrame({
+                'latitude': df['latitude'],
+                'longitude': df['longitude'],
+                'brightness': brightness,
+                'confidence': confidence,
+                'acq_date': acq_date
+            })
+        except Exception as e:
+            log(f" Error with {source}: {e}")
+            return None
+    
+    # Result for a successfully downloaded (or cached) image
+    def _image_result(self, source: str, filename: str, filepath: Path, high_quality: bool, cached: bool = False) -> Dict:
+        """Build the download_image success payload"""
+        result = {
+            'success': True,
+            'source': source,
+            'filename': filename,
+            'file_size_mb': filepath.stat().st_size / (1024 * 1024),
+            'quality': 'High' if high_quality else 'Standard',
+            'resolution': self._image_size(filepath)
+        }
+        if cached:
+            result['cached'] = True
+        return result
+    
+    # Pixel dimensions of a saved image
+    def _image_size(self, filepath: Path) -> str:
+        """Return WIDTHxHEIGHT of an image file (only the header is read)"""
+        with Image.open(filepath) as img:
+            return f"{img.width}x{img.height}"
+    
+    # Conditional GET headers for a stale cached image
+    def _revalidation_headers(self, cache_path: Path) -> Dict:
+        """Return If-None-Match/If-Modified-Since from the validators stored next to a cached image"""
+        meta_path = cache_path.with_suffix('.json')
+        if not cache_path.exists() or not meta_path.exists():
+            return {}
+        try:
+            meta = json.loads(meta_path.read_text())
+        except (OSError, ValueError):
+            return {}
+        
+        headers = {}
+        if meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        if meta.get('last_modified'):
+            headers['If-Modified-Since'] = meta['last_modified']
+        return headers
+    
+    # Store the validators of a freshly downloaded image
+    def _save_validators(self, cache_path: Path, headers) -> None:
+        """Save ETag/Last-Modified next to a cached image (or drop outdated ones)"""
+        meta_path = cache_path.with_suffix('.json')
+        etag, last_modified = headers.get('ETag'), headers.get('Last-Modified')
+        if etag or last_modified:
+            meta_path.write_text(json.dumps({'etag': etag, 'last_modified': last_modified}))
+        elif meta_path.exists():
+            meta_path.unlink()
+    
+    # Keep the image cache under its size cap
+    def _prune_cache(self) -> None:
+        """
+        Delete the least recently used cached images (and their validators) until under MAX_CACHE_BYTES.
+        Images still hard-linked into data/ are skipped: removing them would free nothing.
+        """
+        entries = []
+        with os.scandir(self._cache_dir) as it:
+            for entry in it:
+                if not entry.name.endswith('.png'):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                if stat.st_nlink > 1:
+                    continue
+                entries.append((stat.st_atime, stat.st_size, Path(entry.path)))
+        
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= MAX_CACHE_BYTES:
+                break
+            path.unlink(missing_ok=True)
+            path.with_suffix('.json').unlink(missing_ok=True)
+            total -= size
+            log(f" Evicted cached image {path.name}")
+    
+    # GET through the shared session, holding one of the global request slots
+    @contextmanager
+    def _request(self, url: str, **kwargs):
+        """Yield the response to a GET (closed on exit) while at most MAX_CONCURRENT_REQUESTS are in flight"""
+        with self._request_slots:
+            with self.session.get(url, timeout=HTTP_TIMEOUT, **kwargs) as response:
+                yield response
+    
+    # Request coalescing (single-flight)
+    def _coalesce(self, key: tuple, fn, *args):
+        """Run fn(*args) once per key; callers arriving while it runs wait for and share its result"""
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+        
+        if not leader:
+            return future.result()
+        
+        try:
+            result = fn(*args)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(key, None)
+    
+    # Expose a cached file under its public name
+    def _place_file(self, src: Path, dest: Path):
+        """Hard-link src to dest (copying only across filesystems), replacing dest atomically"""
+        if dest.exists() and os.path.samefile(src, dest):
+            return
+        tmp = dest.with_name(f".{dest.name}.{threading.get_ident()}.tmp")
+        try:
+            os.link(src, tmp)
+        except OSError:
+            shutil.copyfile(src, tmp)
+        os.replace(tmp, dest)
+        # rename() is a no-op when both names already link the same file
+        if tmp.exists():
+            tmp.unlink()
+    
+    # Stream one FIRMS CSV feed into a DataFrame
+    def _read_firms_csv(self, url: str) -> Optional[pd.DataFrame]:
+        """Parse a FIRMS CSV response as it arrives (None if the feed has no data)"""
+        with self._request(url, stream=True) as response:
+            if response.status_code != 200:
+                log(f" No fire data from {url.split('/')[-4]}: {response.status_code}")
+                return None
+            
+            response.raw.decode_content = True
+            try:
+                return pd.read_csv(response.raw, usecols=lambda column: column in FIRMS_DTYPES, dtype=FIRMS_DTYPES)
+            except pd.errors.EmptyDataError:
+                log(f" No fire data from {url.split('/')[-4]}: empty response")
+                return None
+    
+    # Cache lifetime for data of a given date
+    def _cache_ttl(self, date: str, recent_days: int = 0) -> int:
+        """Return the cache TTL in seconds: long for past dates, short for recent ones"""
+        try:
+            age_days = (datetime.now().date() - datetime.strptime(date, '%Y-%m-%d').date()).days
+        except ValueError:
+            return CACHE_TTL_CURRENT
+        return CACHE_TTL_HISTORICAL if age_days > recent_days else CACHE_TTL_CURRENT
+    
     # Get bounding box for region
-    def _get_bbox(self, region: str = "sierra_madre") -> Dict:
+    def _get_bbox(self, region: str = "sierra_madre") -> BBox:
         """Get bounding box for region"""
-        return self.sierra_madre_bbox
+        return self._bbox_by_region.get(region, self.sierra_madre_bbox)
+    
+    # Get precomputed WMS BBOX parameter for region
+    def _get_wms_bbox(self, region: str = "sierra_madre") -> str:
+        """Get the WMS 1.3.0 BBOX string (south,west,north,east) for region"""
+        return self._wms_bbox_by_region.get(region, self._wms_bbox_by_region['sierra_madre'])
+    
+    # Get the native-resolution WMS image size for region
+    def _get_wms_size(self, region: str = "sierra_madre") -> Tuple[int, int]:
+        """Get (WIDTH, HEIGHT) matching the bbox at native resolution, capped at MAX_WMS_SIZE"""
+        bbox = self._get_bbox(region)
+        return (
+            min(MAX_WMS_SIZE, round((bbox.east - bbox.west) / NATIVE_RES_DEG)),
+            min(MAX_WMS_SIZE, round((bbox.north - bbox.south) / NATIVE_RES_DEG))
+        )
     
     def fetch_year_range_images(self, start_year: int = 2010, end_year: int = 2025, region: str = "sierra_madre") -> Dict:
         """
         Fetch images for a range of years (2010-2025)
         Downloads one image per year for the specified date (July 1st)
         """
-        print(f"🛰️ Fetching satellite imagery for {region} from {start_year} to {end_year}")
+        log(f"🛰️ Fetching satellite imagery for {region} from {start_year} to {end_year}")
         
         region_name = region.replace('_', ' ').title()
         results = {
@@ -324,33 +810,36 @@ class SatelliteDataFetcher:
             'timestamp': datetime.now().isoformat()
         }
         
-        # Download images for each year
-        for year in range(start_year, end_year + 1):
-            try:
-                # Use July 1st as the consistent date for each year
-                date_str = f"{year}-07-01"
-                filename = f"{region}_{year}.png"
-                
-                print(f"📡 Downloading {year} imagery...")
-                result = self.download_image(date_str, filename, region)
-                
-                results['images_downloaded'][str(year)] = result
-                
-                if result.get('success', False):
-                    results['successful_years'].append(year)
-                    results['total_images'] += 1
-                    print(f"✅ {year}: Success ({result.get('source', 'Unknown source')})")
-                else:
-                    results['failed_years'].append(year)
-                    print(f"❌ {year}: Failed - {result.get('error', 'Unknown error')}")
+        # Download images for all years concurrently (July 1st as the consistent date)
+        years = list(range(start_year, end_year + 1))
+        log(f"📡 Downloading {len(years)} years of imagery...")
+        with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_DOWNLOADS) as executor:
+            futures = {
+                year: executor.submit(self.download_image, f"{year}-07-01", f"{region}_{year}.png", region)
+                for year in years
+            }
+            
+            for year in years:
+                try:
+                    result = futures[year].result()
                     
-            except Exception as e:
-                print(f"❌ {year}: Exception - {e}")
-                results['failed_years'].append(year)
-                results['images_downloaded'][str(year)] = {
-                    'success': False,
-                    'error': str(e)
-                }
+                    results['images_downloaded'][str(year)] = result
+                    
+                    if result.get('success', False):
+                        results['successful_years'].append(year)
+                        results['total_images'] += 1
+                        log(f"✅ {year}: Success ({result.get('source', 'Unknown source')})")
+                    else:
+                        results['failed_years'].append(year)
+                        log(f"❌ {year}: Failed - {result.get('error', 'Unknown error')}")
+                        
+                except Exception as e:
+                    log(f"❌ {year}: Exception - {e}")
+                    results['failed_years'].append(year)
+                    results['images_downloaded'][str(year)] = {
+                        'success': False,
+                        'error': str(e)
+                    }
         
         # Calculate success rate
         total_years = end_year - start_year + 1
@@ -359,7 +848,7 @@ class SatelliteDataFetcher:
         results['success_rate'] = round(success_rate, 1)
         results['message'] = f"Downloaded {results['total_images']}/{total_years} images ({success_rate:.1f}% success rate)"
         
-        print(f"🎯 Summary: {results['message']}")
+        log(f"🎯 Summary: {results['message']}")
         return results
     
     def fetch_single_year_image(self, year: int, region: str = "sierra_madre") -> Dict:
@@ -370,13 +859,13 @@ class SatelliteDataFetcher:
             date_str = f"{year}-07-01"
             filename = f"{region}_{year}.png"
             
-            print(f"📡 Fetching {year} imagery for {region}...")
+            log(f"📡 Fetching {year} imagery for {region}...")
             result = self.download_image(date_str, filename, region)
             
             if result.get('success', False):
-                print(f"✅ {year}: Downloaded successfully from {result.get('source')}")
+                log(f"✅ {year}: Downloaded successfully from {result.get('source')}")
             else:
-                print(f"❌ {year}: Failed to download")
+                log(f"❌ {year}: Failed to download")
             
             return {
                 'year': year,
@@ -387,7 +876,7 @@ class SatelliteDataFetcher:
             }
             
         except Exception as e:
-            print(f"❌ {year}: Exception - {e}")
+            log(f"❌ {year}: Exception - {e}")
             return {
                 'year': year,
                 'region': region,
@@ -396,6 +885,37 @@ class SatelliteDataFetcher:
                 'timestamp': datetime.now().isoformat()
             }
     
+    # Forget cached fire data and (optionally) downloaded images
+    def clear_cache(self, images: bool = True) -> int:
+        """
+        Drop the in-memory fire data cache and, if images is set, every file in the image
+        download cache so the next fetch goes back to NASA. Returns the number of files removed.
+        """
+        self._fire_cache.clear()
+        if not images:
+            return 0
+        
+        removed = 0
+        with os.scandir(self._cache_dir) as it:
+            for entry in it:
+                try:
+                    os.remove(entry.path)
+                    removed += 1
+                except FileNotFoundError:
+                    continue
+        return removed
+    
+    # Release pooled HTTP connections
+    def close(self):
+        """Close the shared HTTP session"""
+        self.session.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+    
     @property
     def authenticated(self) -> bool:
         """Check if the fetcher is ready to use"""